@@ -7,24 +7,33 @@ Constants for document parsing, variable matching, validation, and other core fu
 import re
 
 # Pre-compiled regex patterns
+# COMPILED_PERCENT_VARIABLE_REGEX and COMPILED_BRACE_VARIABLE_REGEX are no longer used
+# internally (see COMPILED_ANY_VARIABLE_REGEX), kept for backward compatibility
 COMPILED_PERCENT_VARIABLE_REGEX = re.compile(
     r"%\{\{([^}]+)\}\}"  # Match %{{variable}} format for preserved variables
 )
 
 # Interaction regex base patterns
 INTERACTION_PATTERN = r'\?\[([^\]]*)\](?!\()'  # Base pattern with capturing group for content extraction
-INTERACTION_PATTERN_NON_CAPTURING = r'\?\[[^\]]*\](?!\()'  # Non-capturing version for block splitting
+# Non-capturing version, no longer used internally (blocks are classified by split
+# position); kept for backward compatibility
+INTERACTION_PATTERN_NON_CAPTURING = r'\?\[[^\]]*\](?!\()'
 INTERACTION_PATTERN_SPLIT = r'(\?\[[^\]]*\](?!\())' # Pattern for re.split() with outer capturing group
 
 # InteractionParser specific regex patterns
 COMPILED_INTERACTION_REGEX = re.compile(INTERACTION_PATTERN)  # Main interaction pattern matcher
-COMPILED_LAYER1_INTERACTION_REGEX = COMPILED_INTERACTION_REGEX  # Layer 1: Basic format validation (alias)
+# Layer 1: Basic format validation (alias). No longer used internally, layer 1 validates
+# with str methods; kept for backward compatibility
+COMPILED_LAYER1_INTERACTION_REGEX = COMPILED_INTERACTION_REGEX
 COMPILED_LAYER2_VARIABLE_REGEX = re.compile(r'^%\{\{([^}]+)\}\}(.*)$')  # Layer 2: Variable detection
 COMPILED_LAYER3_ELLIPSIS_REGEX = re.compile(r'^(.*?)\.\.\.(.*)')  # Layer 3: Split content around ellipsis
 COMPILED_LAYER3_BUTTON_VALUE_REGEX = re.compile(r'^(.+?)//(.+)$')  # Layer 3: Parse Button//value format
 COMPILED_BRACE_VARIABLE_REGEX = re.compile(
     r"(?<!%)\{\{([^}]+)\}\}"  # Match {{variable}} format for replaceable variables
 )
+COMPILED_ANY_VARIABLE_REGEX = re.compile(
+    r"\{\{([^}]+)\}\}"  # Match both {{variable}} and %{{variable}} in a single scan
+)
 COMPILED_INTERACTION_CONTENT_RECONSTRUCT_REGEX = re.compile(
     r"(\?\[.*?\.\.\.).*?(\])"  # Reconstruct interaction content: prefix + question + suffix
 )
@@ -33,13 +42,25 @@ COMPILED_VARIABLE_REFERENCE_CLEANUP_REGEX = re.compile(
     r"%\{\{.*?\}\}"
 )
 COMPILED_WHITESPACE_CLEANUP_REGEX = re.compile(r"\s+")
+COMPILED_VARIABLE_REPLACEMENT_REGEX = re.compile(
+    r"(?<!%)\{\{([^{}]*)\}\}"  # Match replaceable {{variable}} references, excluding %{{variable}}
+)
+COMPILED_INLINE_OUTPUT_INSTRUCTION_REGEX = re.compile(r"===\s*([^=]+?)\s*===")  # Match inline output instruction
+COMPILED_JSON_OBJECT_REGEX = re.compile(r"\{[^}]+\}")  # Match first flat JSON object in mixed text
+COMPILED_VARIABLE_NAME_REGEX = re.compile(r"^[a-zA-Z_][a-zA-Z0-9_]*$")  # Valid variable name
 
 # Document parsing constants (using shared INTERACTION_PATTERN defined above)
 
 # Separators
 BLOCK_SEPARATOR = r"\n\s*---\s*\n"
+COMPILED_BLOCK_SEPARATOR_REGEX = re.compile(BLOCK_SEPARATOR)
+COMPILED_INTERACTION_SPLIT_REGEX = re.compile(INTERACTION_PATTERN_SPLIT)
 TRIPLE_EQUALS_DELIMITER = "==="
 
+# Cache sizes
+BLOCK_CONTENT_CACHE_SIZE = 1024  # Max cached per-block derived results (output instructions, questions, etc.)
+DOCUMENT_CACHE_SIZE = 256  # Max cached parsed documents
+
 # Output instruction markers
 OUTPUT_INSTRUCTION_PREFIX = "[输出]"
 OUTPUT_INSTRUCTION_SUFFIX = "[/输出]"
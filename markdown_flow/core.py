@@ -4,25 +4,26 @@ Markdown-Flow Core Business Logic
 Refactored MarkdownFlow class with built-in LLM processing capabilities and unified process interface.
 """
 
-import re
-from typing import Any, AsyncGenerator, Dict, List, Optional, Union
+from dataclasses import replace
+from functools import lru_cache
+from typing import Any, AsyncGenerator, Dict, Iterator, List, Optional, Tuple, Union
 
 from .constants import (
-    BLOCK_SEPARATOR,
+    BLOCK_CONTENT_CACHE_SIZE,
     BLOCK_INDEX_OUT_OF_RANGE_ERROR,
     BUTTONS_WITH_TEXT_VALIDATION_TEMPLATE,
     COMPILED_BRACKETS_CLEANUP_REGEX,
     COMPILED_INTERACTION_CONTENT_RECONSTRUCT_REGEX,
+    COMPILED_INTERACTION_SPLIT_REGEX,
     COMPILED_VARIABLE_REFERENCE_CLEANUP_REGEX,
     COMPILED_WHITESPACE_CLEANUP_REGEX,
     DEFAULT_INTERACTION_ERROR_PROMPT,
     DEFAULT_INTERACTION_PROMPT,
     DEFAULT_VALIDATION_SYSTEM_MESSAGE,
+    DOCUMENT_CACHE_SIZE,
     INPUT_EMPTY_ERROR,
     INTERACTION_ERROR_RENDER_INSTRUCTIONS,
     INTERACTION_PARSE_ERROR,
-    INTERACTION_PATTERN_NON_CAPTURING,
-    INTERACTION_PATTERN_SPLIT,
     INTERACTION_RENDER_INSTRUCTIONS,
     LLM_PROVIDER_REQUIRED_ERROR,
     OPTION_SELECTION_ERROR_TEMPLATE,
@@ -39,11 +40,75 @@ from .utils import (
     extract_preserved_content,
     extract_variables_from_text,
     is_preserved_content_block,
+    iter_block_segments,
     parse_validation_response,
     process_output_instructions,
     replace_variables_in_text,
 )
 
+# InteractionParser is stateless, share one instance across all documents
+_INTERACTION_PARSER = InteractionParser()
+
+
+def _iter_document_blocks(document: str) -> Iterator[Block]:
+    """
+    Parse document into blocks, yielding each block as soon as it is parsed.
+
+    Args:
+        document: Markdown document content
+
+    Yields:
+        Parsed blocks in document order
+    """
+    block_index = 0
+
+    for segment in iter_block_segments(document):
+        # Use dedicated split pattern to avoid duplicate blocks from capturing groups
+        if "?[" in segment:
+            parts = COMPILED_INTERACTION_SPLIT_REGEX.split(segment)
+        else:
+            # Fast path: segment cannot contain interaction blocks
+            parts = [segment]
+
+        # Splitting on a capturing group alternates text and matches, so odd
+        # parts are exactly the interaction blocks and need no second match
+        for part_index, part in enumerate(parts):
+            part = part.strip()
+            if part:
+                if part_index % 2:
+                    block_type = BlockType.INTERACTION
+                elif is_preserved_content_block(part):
+                    block_type = BlockType.PRESERVED_CONTENT
+                else:
+                    block_type = BlockType.CONTENT
+
+                yield Block(content=part, block_type=block_type, index=block_index)
+                block_index += 1
+
+
+@lru_cache(maxsize=DOCUMENT_CACHE_SIZE)
+def _parse_document_blocks(document: str) -> Tuple[Block, ...]:
+    """
+    Parse document into blocks, cached by document content.
+
+    Re-rendering the same document with different variables skips parsing,
+    trading memory for up to DOCUMENT_CACHE_SIZE parsed documents for CPU.
+    Returned blocks are shared cache entries and must not be mutated.
+
+    Args:
+        document: Markdown document content
+
+    Returns:
+        Tuple of parsed blocks
+    """
+    return tuple(_iter_document_blocks(document))
+
+
+@lru_cache(maxsize=BLOCK_CONTENT_CACHE_SIZE)
+def _block_interaction_question(content: str) -> Optional[str]:
+    """Extract interaction question text, cached by block content."""
+    return extract_interaction_question(content)
+
 
 class MarkdownFlow:
     """
@@ -116,39 +181,27 @@ class MarkdownFlow:
         if self._blocks is not None:
             return self._blocks
 
-        content = self._document.strip()
-        segments = re.split(BLOCK_SEPARATOR, content)
-        final_blocks = []
-
-        for segment in segments:
-            # Use dedicated split pattern to avoid duplicate blocks from capturing groups
-            parts = re.split(INTERACTION_PATTERN_SPLIT, segment)
-
-            for part in parts:
-                part = part.strip()
-                if part:
-                    # Use non-capturing pattern for matching
-                    if re.match(INTERACTION_PATTERN_NON_CAPTURING, part):
-                        block = Block(
-                            content=part,
-                            block_type=BlockType.INTERACTION,
-                            index=len(final_blocks),
-                        )
-                        final_blocks.append(block)
-                    else:
-                        if is_preserved_content_block(part):
-                            block_type = BlockType.PRESERVED_CONTENT
-                        else:
-                            block_type = BlockType.CONTENT
-
-                        block = Block(
-                            content=part, block_type=block_type, index=len(final_blocks)
-                        )
-                        final_blocks.append(block)
-
-        self._blocks = final_blocks
+        # Copy cached blocks so instances cannot mutate shared parse results
+        self._blocks = [
+            replace(block, variables=list(block.variables))
+            for block in _parse_document_blocks(self._document)
+        ]
         return self._blocks
 
+    def iter_blocks(self) -> Iterator[Block]:
+        """
+        Iterate blocks, parsing lazily if they have not been parsed yet.
+
+        Deliberately bypasses the _parse_document_blocks cache, even when it
+        already holds this document: lru_cache offers no lookup that does not
+        populate it, and populating it would hold every block in memory.
+        Use get_all_blocks() for repeated access to the same document.
+        """
+        if self._blocks is not None:
+            yield from self._blocks
+        else:
+            yield from _iter_document_blocks(self._document)
+
     def get_block(self, index: int) -> Block:
         """Get block at specified index."""
         blocks = self.get_all_blocks()
@@ -282,7 +335,7 @@ class MarkdownFlow:
         block = self.get_block(block_index)
 
         # Extract question text
-        question_text = extract_interaction_question(block.content)
+        question_text = _block_interaction_question(block.content)
         if not question_text:
             # Unable to extract, return original content
             return LLMResult(content=block.content)
@@ -334,9 +387,10 @@ class MarkdownFlow:
 
             # With LLM provider, collect full response then return once
             async def stream_generator():
-                full_response = ""
+                response_chunks = []
                 async for chunk in self._llm_provider.stream(messages):
-                    full_response += chunk
+                    response_chunks.append(chunk)
+                full_response = "".join(response_chunks)
 
                 # Reconstruct final interaction content
                 rendered_content = self._reconstruct_interaction_content(
@@ -368,8 +422,7 @@ class MarkdownFlow:
             return await self._render_error(error_msg, mode)
 
         # Parse interaction format
-        parser = InteractionParser()
-        parse_result = parser.parse(block.content)
+        parse_result = _INTERACTION_PARSER.parse(block.content)
 
         if 'error' in parse_result:
             error_msg = INTERACTION_PARSE_ERROR.format(error=parse_result['error'])
@@ -398,17 +451,17 @@ class MarkdownFlow:
             user_input_stripped = user_input.strip()
 
             # Check if user input matches any button (display or actual value)
-            for button in buttons:
-                if user_input_stripped in [button["display"], button["value"]]:
-                    return LLMResult(
-                        content="",  # Empty content indicates interaction complete
-                        variables={},  # Non-assignment buttons don't set variables
-                        metadata={
-                            "interaction_type": "non_assignment_button",
-                            "button_clicked": button,
-                            "user_input": user_input_stripped,
-                        }
-                    )
+            button = self._match_button(buttons, user_input_stripped)
+            if button is not None:
+                return LLMResult(
+                    content="",  # Empty content indicates interaction complete
+                    variables={},  # Non-assignment buttons don't set variables
+                    metadata={
+                        "interaction_type": "non_assignment_button",
+                        "button_clicked": button,
+                        "user_input": user_input_stripped,
+                    }
+                )
 
             # User input doesn't match any button
             button_displays = [btn["display"] for btn in buttons]
@@ -468,7 +521,7 @@ class MarkdownFlow:
                 llm_response, user_input, target_variable
             )
             return LLMResult(
-                content=parsed_result["content"], variables=parsed_result["variables"]
+                content=parsed_result.content, variables=parsed_result.variables
             )
 
         elif mode == ProcessMode.STREAM:
@@ -478,17 +531,18 @@ class MarkdownFlow:
                 )
 
             async def stream_generator():
-                full_response = ""
+                response_chunks = []
                 async for chunk in self._llm_provider.stream(messages):
-                    full_response += chunk
+                    response_chunks.append(chunk)
+                full_response = "".join(response_chunks)
 
                 # Parse complete response and convert to LLMResult
                 parsed_result = parse_validation_response(
                     full_response, user_input, target_variable
                 )
                 yield LLMResult(
-                    content=parsed_result["content"],
-                    variables=parsed_result["variables"],
+                    content=parsed_result.content,
+                    variables=parsed_result.variables,
                 )
 
             return stream_generator()
@@ -516,20 +570,19 @@ class MarkdownFlow:
         buttons = parse_result.get("buttons", [])
         user_input_stripped = user_input.strip()
 
-        # First check if user input matches any button
-        for button in buttons:
-            # Check display value and actual value
-            if user_input_stripped in [button["display"], button["value"]]:
-                # Use actual value as variable value
-                return LLMResult(
-                    content="",  # Empty content indicates successful variable extraction
-                    variables={target_variable: button["value"]},
-                    metadata={
-                        "button_clicked": button,
-                        "user_input_display": button["display"],
-                        "user_input_value": button["value"],
-                    }
-                )
+        # First check if user input matches any button (display or actual value)
+        button = self._match_button(buttons, user_input_stripped)
+        if button is not None:
+            # Use actual value as variable value
+            return LLMResult(
+                content="",  # Empty content indicates successful variable extraction
+                variables={target_variable: button["value"]},
+                metadata={
+                    "button_clicked": button,
+                    "user_input_display": button["display"],
+                    "user_input_value": button["value"],
+                }
+            )
 
         # User input doesn't match any button
         if not allow_text_input:
@@ -589,7 +642,7 @@ class MarkdownFlow:
                 llm_response, user_input, target_variable
             )
             return LLMResult(
-                content=parsed_result["content"], variables=parsed_result["variables"]
+                content=parsed_result.content, variables=parsed_result.variables
             )
 
         elif mode == ProcessMode.STREAM:
@@ -599,10 +652,11 @@ class MarkdownFlow:
                 )
 
             async def stream_generator():
-                full_response = ""
+                response_chunks = []
                 async for chunk in self._llm_provider.stream(messages):
-                    full_response += chunk
+                    response_chunks.append(chunk)
                     # For validation scenario, don't output chunks in real-time, only final result
+                full_response = "".join(response_chunks)
 
                 # Process final response
                 parsed_result = parse_validation_response(
@@ -611,8 +665,8 @@ class MarkdownFlow:
 
                 # Return only final parsing result
                 yield LLMResult(
-                    content=parsed_result["content"],
-                    variables=parsed_result["variables"],
+                    content=parsed_result.content,
+                    variables=parsed_result.variables,
                 )
 
             return stream_generator()
@@ -725,13 +779,10 @@ class MarkdownFlow:
             system_message = DEFAULT_VALIDATION_SYSTEM_MESSAGE
         else:
             # Use smart default validation template
-            from .utils import (
-                extract_interaction_question,
-                generate_smart_validation_template,
-            )
+            from .utils import generate_smart_validation_template
 
             # Extract interaction question
-            interaction_question = extract_interaction_question(block.content)
+            interaction_question = _block_interaction_question(block.content)
 
             # Generate smart validation template
             validation_template = generate_smart_validation_template(
@@ -805,6 +856,16 @@ Original Error: {error_message}
 
     # Helper methods
 
+    @staticmethod
+    def _match_button(
+        buttons: List[Dict[str, str]], user_input: str
+    ) -> Optional[Dict[str, str]]:
+        """Find the first button whose display or actual value equals user input."""
+        for button in buttons:
+            if user_input == button["display"] or user_input == button["value"]:
+                return button
+        return None
+
     def _reconstruct_interaction_content(
         self, original_content: str, rendered_question: str
     ) -> str:
@@ -20,7 +20,7 @@ class ProcessMode(Enum):
     STREAM = "stream"  # Streaming processing
 
 
-@dataclass
+@dataclass(slots=True)
 class LLMResult:
     """Unified LLM processing result."""
 
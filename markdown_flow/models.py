@@ -10,8 +10,15 @@ from typing import List, Optional, Union
 from .enums import BlockType, InputType
 from .utils import extract_variables_from_text
 
+# Efficient type mapping for string block types
+_BLOCK_TYPE_MAPPING = {
+    "content": BlockType.CONTENT,
+    "interaction": BlockType.INTERACTION,
+    "preserved_content": BlockType.PRESERVED_CONTENT,
+}
 
-@dataclass
+
+@dataclass(slots=True)
 class UserInput:
     """
     Simplified user input data class.
@@ -27,7 +34,7 @@ class UserInput:
     variable_name: str = "user_input"
 
 
-@dataclass
+@dataclass(slots=True)
 class InteractionValidationConfig:
     """
     Simplified interaction validation configuration.
@@ -43,7 +50,7 @@ class InteractionValidationConfig:
     enable_custom_validation: bool = True
 
 
-@dataclass
+@dataclass(slots=True)
 class Block:
     """
     Simplified document block data class.
@@ -64,20 +71,14 @@ class Block:
         """Post-initialization processing."""
         # Convert to BlockType enum
         if isinstance(self.block_type, str):
-            # Efficient type mapping
-            type_mapping = {
-                "content": BlockType.CONTENT,
-                "interaction": BlockType.INTERACTION,
-                "preserved_content": BlockType.PRESERVED_CONTENT,
-            }
-
-            self.block_type = type_mapping.get(
+            self.block_type = _BLOCK_TYPE_MAPPING.get(
                 self.block_type, self._parse_block_type_fallback(self.block_type)
             )
 
-        # Auto-extract variables
+        # Auto-extract variables in order of appearance, so an interaction's
+        # assigned %{{variable}} comes first
         if not self.variables:
-            self.variables = extract_variables_from_text(self.content)
+            self.variables = extract_variables_from_text(self.content, sort=False)
 
     def _parse_block_type_fallback(self, block_type_str: str) -> BlockType:
         """Fallback logic for non-standard block_type strings."""
@@ -94,4 +95,4 @@ class Block:
     @property
     def is_content(self) -> bool:
         """Check if this is a content block."""
-        return self.block_type in [BlockType.CONTENT, BlockType.PRESERVED_CONTENT]
+        return self.block_type in (BlockType.CONTENT, BlockType.PRESERVED_CONTENT)
@@ -7,16 +7,21 @@ Collection of utility functions for document parsing, variable extraction, and t
 import json
 import re
 from enum import Enum
-from typing import Any, Dict, List, Optional, Tuple
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
 
 from .constants import (
-    COMPILED_BRACE_VARIABLE_REGEX,
+    BLOCK_CONTENT_CACHE_SIZE,
+    COMPILED_ANY_VARIABLE_REGEX,
+    COMPILED_BLOCK_SEPARATOR_REGEX,
+    COMPILED_INLINE_OUTPUT_INSTRUCTION_REGEX,
     COMPILED_INTERACTION_REGEX,
-    COMPILED_LAYER1_INTERACTION_REGEX,
+    COMPILED_JSON_OBJECT_REGEX,
     COMPILED_LAYER2_VARIABLE_REGEX,
     COMPILED_LAYER3_ELLIPSIS_REGEX,
     COMPILED_LAYER3_BUTTON_VALUE_REGEX,
-    COMPILED_PERCENT_VARIABLE_REGEX,
+    COMPILED_VARIABLE_NAME_REGEX,
+    COMPILED_VARIABLE_REPLACEMENT_REGEX,
     CONTEXT_CONVERSATION_TEMPLATE,
     CONTEXT_QUESTION_MARKER,
     CONTEXT_QUESTION_TEMPLATE,
@@ -33,7 +38,7 @@ from .constants import (
 )
 
 
-def extract_variables_from_text(text: str) -> List[str]:
+def extract_variables_from_text(text: str, sort: bool = True) -> List[str]:
     """
     Extract all variable names from text.
 
@@ -43,23 +48,64 @@ def extract_variables_from_text(text: str) -> List[str]:
 
     Args:
         text: Text content to analyze
+        sort: Sort names alphabetically, otherwise keep order of first appearance
 
     Returns:
-        Sorted list of unique variable names
+        List of unique variable names
     """
-    variables = set()
+    # Fast path: both variable formats require "{{"
+    if "{{" not in text:
+        return []
 
-    # Match %{{...}} format variables using pre-compiled regex
-    matches = COMPILED_PERCENT_VARIABLE_REGEX.findall(text)
-    for match in matches:
-        variables.add(match.strip())
+    # Match %{{...}} and {{...}} format variables in one pass, the % prefix
+    # does not affect extraction. dict.fromkeys de-duplicates in insertion order
+    variables = dict.fromkeys(
+        match.group(1).strip() for match in COMPILED_ANY_VARIABLE_REGEX.finditer(text)
+    )
 
-    # Match {{...}} format variables (excluding %) using pre-compiled regex
-    matches = COMPILED_BRACE_VARIABLE_REGEX.findall(text)
-    for match in matches:
-        variables.add(match.strip())
+    return sorted(variables) if sort else list(variables)
 
-    return sorted(list(variables))
+
+def iter_block_segments(content: str) -> Iterator[str]:
+    """
+    Split document content into segments on --- separator lines.
+
+    Lazy equivalent of re.split(BLOCK_SEPARATOR, content.strip()): segments
+    are cut between separator matches and yielded one at a time. Surrounding
+    whitespace is skipped by offsets, so neither a stripped copy of the
+    content nor the segment list is built.
+
+    Args:
+        content: Document content to split
+
+    Yields:
+        Segments in document order, unstripped
+    """
+    # Bounds of content.strip() without copying the content
+    start, end = 0, len(content)
+    while start < end and content[start].isspace():
+        start += 1
+    while end > start and content[end - 1].isspace():
+        end -= 1
+
+    segment_start = start
+    for match in COMPILED_BLOCK_SEPARATOR_REGEX.finditer(content, start, end):
+        yield content[segment_start:match.start()]
+        segment_start = match.end()
+
+    yield content[segment_start:end]
+
+
+def _inline_preserved_content(stripped_line: str) -> Optional[str]:
+    """Return the text between the delimiters of a ===content=== line, or None if not that shape."""
+    delimiter_length = len(TRIPLE_EQUALS_DELIMITER)
+    if (
+        len(stripped_line) > 2 * delimiter_length
+        and stripped_line.startswith(TRIPLE_EQUALS_DELIMITER)
+        and stripped_line.endswith(TRIPLE_EQUALS_DELIMITER)
+    ):
+        return stripped_line[delimiter_length:-delimiter_length]
+    return None
 
 
 def is_preserved_content_block(content: str) -> bool:
@@ -75,29 +121,31 @@ def is_preserved_content_block(content: str) -> bool:
     Returns:
         True if content is fully wrapped by === markers
     """
+    # Fast path: both formats require === markers
+    if TRIPLE_EQUALS_DELIMITER not in content:
+        return False
+
     content = content.strip()
     if not content:
         return False
 
-    lines = content.split("\n")
+    # Strip each line once, both checks below work on stripped lines
+    stripped_lines = [line.strip() for line in content.split("\n")]
 
     # Check if all non-empty lines are inline format
     all_inline_format = True
     has_any_content = False
 
-    for line in lines:
-        stripped_line = line.strip()
+    for stripped_line in stripped_lines:
         if stripped_line:  # Non-empty line
             has_any_content = True
             # Check if inline format
-            import re
-
-            match = re.match(r"^===(.+)===$", stripped_line)
-            if not match:
+            inline_content = _inline_preserved_content(stripped_line)
+            if inline_content is None:
                 all_inline_format = False
                 break
             # Ensure inner content exists and contains no equals signs
-            inner_content = match.group(1).strip()
+            inner_content = inline_content.strip()
             if not inner_content or "=" in inner_content:
                 all_inline_format = False
                 break
@@ -110,9 +158,7 @@ def is_preserved_content_block(content: str) -> bool:
     has_content_outside = False  # Has external content
     has_preserve_blocks = False  # Has preserve blocks
 
-    for line in lines:
-        stripped_line = line.strip()
-
+    for stripped_line in stripped_lines:
         if stripped_line == TRIPLE_EQUALS_DELIMITER:
             if state == "OUTSIDE":
                 # Enter preserve block
@@ -126,8 +172,9 @@ def is_preserved_content_block(content: str) -> bool:
             # Non-=== lines
             if stripped_line:  # Non-empty line
                 if state == "OUTSIDE":
-                    # External content found
+                    # External content found, no need to scan further
                     has_content_outside = True
+                    break
                 # Internal content doesn't affect judgment
 
     # Judgment conditions:
@@ -224,17 +271,14 @@ class InteractionParser:
             Extracted bracket content, None if validation fails
         """
         content = content.strip()
-        match = COMPILED_LAYER1_INTERACTION_REGEX.search(content)
 
-        if not match:
+        # Content must be exactly ?[...], and [^\]]* allows no other ] inside
+        if not (content.startswith("?[") and content.endswith("]")):
             return None
-
-        # Ensure matched content is complete (no other text)
-        matched_text = match.group(0)
-        if matched_text.strip() != content:
+        if content.count("]") != 1:
             return None
 
-        return match.group(1)
+        return content[2:-1]
 
     def _layer2_detect_variable(self, inner_content: str) -> Tuple[bool, Optional[str], str]:
         """
@@ -246,7 +290,12 @@ class InteractionParser:
         Returns:
             Tuple of (has_variable, variable_name, remaining_content)
         """
-        match = COMPILED_LAYER2_VARIABLE_REGEX.match(inner_content)
+        # Variable assignment must start with %{{, skip the regex otherwise
+        match = (
+            COMPILED_LAYER2_VARIABLE_REGEX.match(inner_content)
+            if inner_content.startswith("%{{")
+            else None
+        )
 
         if not match:
             # No variable, use entire content for display button parsing
@@ -268,16 +317,18 @@ class InteractionParser:
         Returns:
             Parsing result dictionary
         """
-        # Detect ... separator
-        ellipsis_match = COMPILED_LAYER3_ELLIPSIS_REGEX.match(content)
+        # Detect ... separator, a substring check avoids the regex when absent
+        ellipsis_match = (
+            COMPILED_LAYER3_ELLIPSIS_REGEX.match(content) if "..." in content else None
+        )
 
         if ellipsis_match:
             # Has ... separator
             before_ellipsis = ellipsis_match.group(1).strip()
             question = ellipsis_match.group(2).strip()
 
-            if '|' in before_ellipsis and before_ellipsis:
-                # Button group + text input
+            if before_ellipsis:
+                # Button group or single button + text input
                 buttons = self._parse_buttons(before_ellipsis)
                 return {
                     'type': InteractionType.BUTTONS_WITH_TEXT,
@@ -286,26 +337,15 @@ class InteractionParser:
                     'question': question
                 }
             else:
-                # Pure text input or single button + text
-                if before_ellipsis:
-                    # Has prefix buttons
-                    buttons = self._parse_buttons(before_ellipsis)
-                    return {
-                        'type': InteractionType.BUTTONS_WITH_TEXT,
-                        'variable': variable_name,
-                        'buttons': buttons,
-                        'question': question
-                    }
-                else:
-                    # Pure text input
-                    return {
-                        'type': InteractionType.TEXT_ONLY,
-                        'variable': variable_name,
-                        'question': question
-                    }
+                # Pure text input
+                return {
+                    'type': InteractionType.TEXT_ONLY,
+                    'variable': variable_name,
+                    'question': question
+                }
         else:
             # No ... separator
-            if '|' in content and content:
+            if '|' in content:
                 # Pure button group
                 buttons = self._parse_buttons(content)
                 return {
@@ -393,7 +433,11 @@ class InteractionParser:
         button_text = button_text.strip()
 
         # Detect Button//value format
-        match = COMPILED_LAYER3_BUTTON_VALUE_REGEX.match(button_text)
+        match = (
+            COMPILED_LAYER3_BUTTON_VALUE_REGEX.match(button_text)
+            if "//" in button_text
+            else None
+        )
 
         if match:
             display = match.group(1).strip()
@@ -500,18 +544,20 @@ def parse_json_response(response_text: str) -> Dict[str, Any]:
         return json.loads(text)
     except json.JSONDecodeError:
         # Try to extract first JSON object
-        json_match = re.search(r"\{[^}]+\}", text)
+        json_match = COMPILED_JSON_OBJECT_REGEX.search(text)
         if json_match:
             return json.loads(json_match.group())
         else:
             raise ValueError(JSON_PARSE_ERROR)
 
 
+@lru_cache(maxsize=BLOCK_CONTENT_CACHE_SIZE)
 def process_output_instructions(content: str) -> str:
     """
     Process output instruction markers, converting === format to [output] format.
 
     Uses unified state machine to handle inline (===content===) and multiline formats.
+    Results are cached per content string, since a block is re-processed on every call.
 
     Args:
         content: Raw content containing output instructions
@@ -519,6 +565,10 @@ def process_output_instructions(content: str) -> str:
     Returns:
         Processed content with === markers converted to [output] format
     """
+    # Fast path: nothing to convert without === markers
+    if TRIPLE_EQUALS_DELIMITER not in content:
+        return content
+
     lines = content.split("\n")
     result_lines = []
     i = 0
@@ -530,7 +580,7 @@ def process_output_instructions(content: str) -> str:
         # Check if contains === markers
         if "===" in line:
             # Check inline format: ===content===
-            inline_match = re.search(r"===\s*([^=]+?)\s*===", line)
+            inline_match = COMPILED_INLINE_OUTPUT_INSTRUCTION_REGEX.search(line)
             if inline_match and line.count("===") >= 2:
                 # Process inline format
                 full_match = inline_match.group(0)
@@ -616,11 +666,12 @@ def process_output_instructions(content: str) -> str:
     return processed_content
 
 
+@lru_cache(maxsize=BLOCK_CONTENT_CACHE_SIZE)
 def extract_preserved_content(content: str) -> str:
     """
     Extract actual content from preserved content blocks, removing === markers.
 
-    Handles inline (===content===) and multiline formats.
+    Handles inline (===content===) and multiline formats. Results are cached per content.
 
     Args:
         content: Preserved content containing === markers
@@ -639,10 +690,10 @@ def extract_preserved_content(content: str) -> str:
         stripped_line = line.strip()
 
         # Check inline format
-        match = re.match(r"^===(.+)===$", stripped_line)
-        if match:
+        inline_content = _inline_preserved_content(stripped_line)
+        if inline_content is not None:
             # Inline format, extract middle content
-            inner_content = match.group(1).strip()
+            inner_content = inline_content.strip()
             if inner_content and "=" not in inner_content:
                 result_lines.append(inner_content)
         elif stripped_line == TRIPLE_EQUALS_DELIMITER:
@@ -655,9 +706,16 @@ def extract_preserved_content(content: str) -> str:
     return "\n".join(result_lines)
 
 
+class ValidationResponse(NamedTuple):
+    """Parsed LLM validation response."""
+
+    content: str  # Error reason, empty when validation succeeded
+    variables: Optional[Dict[str, Any]]  # Extracted variables, None when validation failed
+
+
 def parse_validation_response(
     llm_response: str, original_input: str, target_variable: str
-) -> Dict[str, Any]:
+) -> ValidationResponse:
     """
     Parse LLM validation response, returning standard format.
 
@@ -669,7 +727,7 @@ def parse_validation_response(
         target_variable: Target variable name
 
     Returns:
-        Standardized parsing result with content and variables fields
+        ValidationResponse with content and variables fields
     """
     try:
         # Try to parse JSON response
@@ -684,12 +742,12 @@ def parse_validation_response(
                 if target_variable not in parse_vars:
                     parse_vars[target_variable] = original_input.strip()
 
-                return {"content": "", "variables": parse_vars}
+                return ValidationResponse(content="", variables=parse_vars)
 
             elif result == VALIDATION_RESPONSE_ILLEGAL:
                 # Validation failed
                 reason = parsed_response.get("reason", VALIDATION_ILLEGAL_DEFAULT_REASON)
-                return {"content": reason, "variables": None}
+                return ValidationResponse(content=reason, variables=None)
 
     except (json.JSONDecodeError, ValueError, KeyError):
         # JSON parsing failed, fallback to text mode
@@ -700,9 +758,11 @@ def parse_validation_response(
 
     # Check against standard response format
     if "ok" in response_lower or "valid" in response_lower:
-        return {"content": "", "variables": {target_variable: original_input.strip()}}
+        return ValidationResponse(
+            content="", variables={target_variable: original_input.strip()}
+        )
     else:
-        return {"content": llm_response, "variables": None}
+        return ValidationResponse(content=llm_response, variables=None)
 
 
 def replace_variables_in_text(
@@ -711,6 +771,8 @@ def replace_variables_in_text(
     """
     Replace variables in text, undefined or empty variables are auto-assigned "UNKNOWN".
 
+    The variables mapping is not modified.
+
     Args:
         text: Text containing variables
         variables: Variable name to value mapping
@@ -721,36 +783,26 @@ def replace_variables_in_text(
     if not text or not isinstance(text, str):
         return text or ""
 
-    # Check each variable for null or empty values, assign "UNKNOWN" if so
-    if variables:
-        for key, value in variables.items():
-            if value is None or value == "":
-                variables[key] = VARIABLE_DEFAULT_VALUE
-
-    # re module already imported at file top
+    # Fast path: no variable references to replace
+    if "{{" not in text:
+        return text
 
-    # Initialize variables as empty dict (if None)
-    if not variables:
-        variables = {}
-    
-    # Find all {{variable}} format variable references
-    variable_pattern = r"\{\{([^{}]+?)\}\}"
-    matches = re.findall(variable_pattern, text)
-    
-    # Assign "UNKNOWN" to undefined variables
-    for var_name in matches:
-        var_name = var_name.strip()
-        if var_name not in variables:
-            variables[var_name] = "UNKNOWN"
+    variables = variables or {}
 
-    # Use updated replacement logic, preserve %{{var_name}} format variables
-    result = text
-    for var_name, var_value in variables.items():
-        # Use negative lookbehind assertion to exclude %{{var_name}} format
-        pattern = f"(?<!%){{{{{re.escape(var_name)}}}}}"
-        result = re.sub(pattern, var_value, result)
+    def _replace(match: re.Match) -> str:
+        var_name = match.group(1)
+        if var_name in variables:
+            var_value = variables[var_name]
+            # Null or empty values are replaced with "UNKNOWN"
+            return VARIABLE_DEFAULT_VALUE if var_value is None or var_value == "" else var_value
+        # Undefined variables are replaced with "UNKNOWN", padded references
+        # like {{ name }} are only replaced by an exact key
+        if var_name and var_name == var_name.strip():
+            return VARIABLE_DEFAULT_VALUE
+        return match.group(0)
 
-    return result
+    # Single pass over {{var_name}} references, preserving %{{var_name}} format variables
+    return COMPILED_VARIABLE_REPLACEMENT_REGEX.sub(_replace, text)
 
 
 def validate_variable_name(variable_name: str) -> bool:
@@ -779,5 +831,4 @@ def validate_variable_name(variable_name: str) -> bool:
     
     # Check if variable name matches pattern: starts with letter or underscore,
     # followed by letters, numbers, or underscores
-    pattern = r'^[a-zA-Z_][a-zA-Z0-9_]*$'
-    return bool(re.match(pattern, variable_name.strip()))
+    return bool(COMPILED_VARIABLE_NAME_REGEX.match(variable_name.strip()))